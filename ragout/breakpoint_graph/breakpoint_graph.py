@@ -105,6 +105,9 @@ class BreakpointGraph(object):
         g = nx.Graph()
         g.add_nodes_from(self.bp_graph.nodes)
 
+        #all parsimony queries are gathered first and scored in one
+        #batch call -- much cheaper than one estimate_tree per adjacency
+        queries = []
         for node in self.bp_graph.nodes:
             adjacencies = {}
             for neighbor in self.bp_graph.neighbors(node):
@@ -115,15 +118,21 @@ class BreakpointGraph(object):
                 if ref_id not in adjacencies:
                     adjacencies[ref_id] = None  #"void" state in paper
 
-            break_weights = {}
             for neighbor in self.bp_graph.neighbors(node):
                 adjacencies[self.target] = neighbor
-                break_weights[neighbor] = phylogeny.estimate_tree(adjacencies)
+                queries.append((node, neighbor, dict(adjacencies)))
 
+        scores = phylogeny.estimate_trees_batch([q[2] for q in queries])
+        break_weights = {}
+        for (node, neighbor, _adj), score in zip(queries, scores):
+            break_weights.setdefault(node, {})[neighbor] = score
+
+        for node in self.bp_graph.nodes:
             #normalization
-            total_weights = sum(break_weights.values())
+            node_weights = break_weights.get(node, {})
+            total_weights = sum(node_weights.values())
             for neighbor in self.bp_graph.neighbors(node):
-                weight = (break_weights[neighbor] / total_weights
+                weight = (node_weights[neighbor] / total_weights
                           if total_weights != 0 else 0)
                 _update_edge(g, node, neighbor, weight)
 
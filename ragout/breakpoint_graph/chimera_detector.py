@@ -14,6 +14,7 @@ import logging
 from collections import defaultdict, namedtuple
 from copy import copy, deepcopy
 from ragout.six.moves import range
+from ragout.six.moves import zip
 
 
 logger = logging.getLogger()
@@ -167,17 +168,28 @@ class ChimeraDetector(object):
         """
         logger.info("Removing chimeric adjacencies")
 
-        new_container = deepcopy(perm_container)
-        new_target_perms = []
+        breaks_by_perm = []
         num_breaks = 0
-        num_chimeras = 0
-
-        for perm in new_container.target_perms:
+        for perm in perm_container.target_perms:
             break_points = []
             for size in block_sizes:
                 break_points.extend(self.hierarchical_cuts[perm.chr_name][size])
             break_points = list(set(break_points))
+            breaks_by_perm.append(break_points)
             num_breaks += len(break_points)
+
+        #no cuts at this scale: return the input container unchanged, so
+        #that callers can reuse structures built from it (breakpoint graph)
+        if not num_breaks:
+            logger.debug("Chimera Detector: no cuts made")
+            return perm_container
+
+        new_container = deepcopy(perm_container)
+        new_target_perms = []
+        num_chimeras = 0
+
+        for perm, break_points in zip(new_container.target_perms,
+                                      breaks_by_perm):
             if not break_points:
                 new_target_perms.append(perm)
             else:
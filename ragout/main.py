@@ -12,7 +12,9 @@ import os
 import shutil
 import logging
 import argparse
+import importlib
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
 import ragout.assembly_graph.assembly_refine as asref
 import ragout.scaffolder.scaffolder as scfldr
@@ -29,20 +31,21 @@ from ragout.breakpoint_graph.permutation import (PermutationContainer,
 from ragout.synteny_backend.synteny_backend import (SyntenyBackend,
                                                     BackendException)
 from ragout.parsers.recipe_parser import parse_ragout_recipe, RecipeException
-from ragout.parsers.fasta_parser import read_fasta_dict, FastaError
+from ragout.parsers.fasta_parser import IndexedFasta, FastaError
 from ragout.shared.debug import DebugConfig
 from ragout.breakpoint_graph.breakpoint_graph import BreakpointGraph
 from ragout.breakpoint_graph.inferer import AdjacencyInferer
 from ragout.breakpoint_graph.chimera_detector import ChimeraDetector
 from ragout.__version__ import __version__
-
-#register backends
-import ragout.synteny_backend.sibelia
-#import synteny_backend.cactus
-import ragout.synteny_backend.maf
-import ragout.synteny_backend.hal
 import ragout.six as six
 
+#available backends; each module registers itself on import,
+#so only the selected one is imported to keep the startup fast
+SYNTENY_BACKENDS = {"sibelia" : "ragout.synteny_backend.sibelia",
+                    #"cactus" : "ragout.synteny_backend.cactus",
+                    "maf" : "ragout.synteny_backend.maf",
+                    "hal" : "ragout.synteny_backend.hal"}
+
 logger = logging.getLogger()
 debugger = DebugConfig.get_instance()
 
@@ -77,6 +80,7 @@ def _check_extern_modules(backend):
     """
     Checks if all necessary native modules are available
     """
+    importlib.import_module(SYNTENY_BACKENDS[backend])
     backends = SyntenyBackend.get_available_backends()
     if backend not in backends:
         raise BackendException("\"{0}\" is not installed.".format(backend))
@@ -135,6 +139,20 @@ def _get_phylogeny_and_naming_ref(recipe, permutation_file):
     return phylogeny, naming_ref
 
 
+def _build_stage_perms(stage, perm_file, recipe, phylogeny,
+                       debugging, debug_dir):
+    """
+    Builds the permutation container and the raw breakpoint graph of a
+    single stage. Stages are independent at this point, so this function
+    may run in a worker process
+    """
+    debugger.set_debugging(debugging)
+    debugger.set_debug_dir(debug_dir)
+    perms = PermutationContainer(perm_file, recipe, stage.repeats,
+                                 stage.ref_indels, phylogeny)
+    return perms, BreakpointGraph(perms)
+
+
 def _get_synteny_scale(recipe, synteny_backend):
     if "blocks" in recipe:
         if isinstance(recipe["blocks"], six.string_types):
@@ -152,8 +170,7 @@ def _run_ragout(args):
     """
     Top-level logic of the program
     """
-    if not os.path.isdir(args.out_dir):
-        os.mkdir(args.out_dir)
+    os.makedirs(args.out_dir, exist_ok=True)
 
     debug_root = os.path.join(args.out_dir, "debug")
     debugger.set_debugging(args.debug)
@@ -181,20 +198,46 @@ def _run_ragout(args):
     phylogeny, naming_ref = _get_phylogeny_and_naming_ref(recipe,
                                                           phylo_perm_file)
 
-    #parsing permutation files, apply filters and build breakpoint graph
+    #parsing permutation files, apply filters and build breakpoint graph;
+    #stages are independent of each other here, so with multiple threads
+    #they are processed by a pool of worker processes
     logger.info("Processing permutation files")
     raw_bp_graphs = {}
     stage_perms = {}
     run_stages = _make_run_stages(synteny_sizes, args.resolve_repeats)
-    for stage in run_stages:
-        debugger.set_debug_dir(os.path.join(debug_root, stage.name))
-        stage_perms[stage] = PermutationContainer(perm_files[stage.block_size],
-                                                  recipe, stage.repeats,
-                                                  stage.ref_indels, phylogeny)
-        raw_bp_graphs[stage] = BreakpointGraph(stage_perms[stage])
+    stage_dirs = {stage : os.path.join(debug_root, stage.name)
+                  for stage in run_stages}
+    if args.threads > 1 and len(run_stages) > 1:
+        with ProcessPoolExecutor(max_workers=args.threads) as pool:
+            futures = {}
+            for stage in run_stages:
+                futures[stage] = \
+                    pool.submit(_build_stage_perms, stage,
+                                perm_files[stage.block_size], recipe,
+                                phylogeny, args.debug, stage_dirs[stage])
+            #collected in stage order to keep the output deterministic
+            for stage in run_stages:
+                stage_perms[stage], raw_bp_graphs[stage] = \
+                                                    futures[stage].result()
+    else:
+        for stage in run_stages:
+            stage_perms[stage], raw_bp_graphs[stage] = \
+                _build_stage_perms(stage, perm_files[stage.block_size],
+                                   recipe, phylogeny, args.debug,
+                                   stage_dirs[stage])
 
     #initializing chimera detector
-    target_sequences = read_fasta_dict(synteny_backend.get_target_fasta())
+    target_fasta_file = synteny_backend.get_target_fasta()
+    target_sequences = IndexedFasta(target_fasta_file)
+
+    #the native overlap module only matters for refinement and is
+    #independent of the stage loop below, so it runs in background
+    overlap_proc = None
+    out_overlap = os.path.join(args.out_dir, "contigs_overlap.dot")
+    if args.refine:
+        overlap_proc = overlap.make_overlap_graph_async(target_fasta_file,
+                                                        out_overlap)
+
     chim_detect = None
     if not args.solid_scaffolds:
         chim_detect = ChimeraDetector(raw_bp_graphs, run_stages, target_sequences)
@@ -204,13 +247,17 @@ def _run_ragout(args):
     prev_stages = []
     for stage in run_stages:
         logger.info("Stage \"%s\"", stage.name)
-        debugger.set_debug_dir(os.path.join(debug_root, stage.name))
+        debugger.set_debug_dir(stage_dirs[stage])
         prev_stages.append(stage)
 
         broken_perms = stage_perms[stage]
         if not args.solid_scaffolds:
             broken_perms = chim_detect.break_contigs(stage_perms[stage], [stage])
-        breakpoint_graph = BreakpointGraph(broken_perms)
+        if broken_perms is stage_perms[stage]:
+            #nothing was broken -- reuse the graph built for ChimeraDetector
+            breakpoint_graph = raw_bp_graphs[stage]
+        else:
+            breakpoint_graph = BreakpointGraph(broken_perms)
 
         adj_inferer = AdjacencyInferer(breakpoint_graph, phylogeny)
         adjacencies = adj_inferer.infer_adjacencies()
@@ -240,9 +287,7 @@ def _run_ragout(args):
 
     #refine with the assembly graph
     if args.refine:
-        out_overlap = os.path.join(args.out_dir, "contigs_overlap.dot")
-        overlap.make_overlap_graph(synteny_backend.get_target_fasta(),
-                                   out_overlap)
+        overlap.wait_overlap_graph(overlap_proc)
         scaffolds = asref.refine_scaffolds(out_overlap, scaffolds,
                                            target_sequences)
         if args.debug:
@@ -268,7 +313,7 @@ def main():
                         default="ragout-out")
     parser.add_argument("-s", "--synteny", dest="synteny_backend",
                         default="sibelia",
-                        choices=["sibelia", "maf", "hal"],
+                        choices=list(SYNTENY_BACKENDS),
                         help="backend for synteny block decomposition")
     parser.add_argument("--refine", action="store_true",
                         dest="refine", default=False,
@@ -12,6 +12,7 @@ from __future__ import division
 import os
 import logging
 import subprocess
+import threading
 
 from ragout.shared import config
 from ragout.shared.utils import which
@@ -42,9 +43,11 @@ def check_binary():
     return True
 
 
-def make_overlap_graph(contigs_file, dot_file):
+def make_overlap_graph_async(contigs_file, dot_file):
     """
-    Builds assembly graph and outputs it in "dot" format
+    Starts the native overlap module in background and returns the
+    process handle, so that the graph is built while the caller keeps
+    doing other work
     """
     cmdline = [OVERLAP_EXEC, contigs_file, dot_file,
                str(config.vals["overlap"]["min_overlap"]),
@@ -53,11 +56,38 @@ def make_overlap_graph(contigs_file, dot_file):
         cmdline.append("--detect-kmer")
 
     logger.info("Building assembly graph")
-    proc = subprocess.Popen(cmdline)
-    #for line in iter(proc.stderr.readline, ""):
-    #    logger.debug(line.strip())
+    proc = subprocess.Popen(cmdline, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT)
+
+    #the pipe is drained as output appears: progress shows up in the
+    #debug log right away and the native process never stalls on a
+    #full pipe buffer while the caller is busy
+    def _drain():
+        for line in iter(proc.stdout.readline, b""):
+            logger.debug(line.decode(errors="replace").rstrip())
+        proc.stdout.close()
+
+    proc.log_thread = threading.Thread(target=_drain)
+    proc.log_thread.daemon = True
+    proc.log_thread.start()
+    return proc
+
+
+def wait_overlap_graph(proc):
+    """
+    Waits for a process started by make_overlap_graph_async and
+    checks that it succeeded
+    """
+    proc.log_thread.join()
     ret_code = proc.wait()
     if ret_code:
         raise OverlapException("Error building overlap graph: Non-zero return "
                                "code when calling {0} "
                                "module: {1}".format(OVERLAP_EXEC, ret_code))
+
+
+def make_overlap_graph(contigs_file, dot_file):
+    """
+    Builds assembly graph and outputs it in "dot" format
+    """
+    wait_overlap_graph(make_overlap_graph_async(contigs_file, dot_file))
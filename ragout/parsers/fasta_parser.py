@@ -9,6 +9,8 @@ This module provides some basic FASTA I/O
 from __future__ import absolute_import
 from __future__ import division
 import logging
+import mmap
+import os
 import sys
 if sys.version_info < (3, 0):
     from string import maketrans
@@ -60,6 +62,73 @@ def read_fasta_dict(filename):
     return fasta_dict
 
 
+class IndexedFasta(object):
+    """
+    Dict-like read-only view of a fasta file. The file is scanned once for
+    validation and record offsets, then kept memory-mapped; sequences are
+    decoded on demand instead of being loaded into Python strings upfront.
+    Useful for large assemblies where read_fasta_dict would take gigabytes.
+    """
+    def __init__(self, filename):
+        logger.info("Indexing contigs file")
+
+        self._index = {}
+        header = None
+        seq_start = None
+        try:
+            with open(filename, "rb") as f:
+                offset = 0
+                for lineno, line in enumerate(f):
+                    next_offset = offset + len(line)
+                    line = line.strip()
+                    if line.startswith(b">"):
+                        if header is not None:
+                            self._index[header] = (seq_start, offset)
+                        header = _STR(line[1:].split(b" ")[0])
+                        seq_start = next_offset
+                    elif line:
+                        if not _validate_seq(line):
+                            raise FastaError("Invalid char in \"{0}\" at "
+                                             "line {1}".format(filename,
+                                                               lineno))
+                    offset = next_offset
+
+                if header is not None:
+                    self._index[header] = (seq_start, offset)
+
+            self._mmap = None
+            if os.path.getsize(filename):
+                with open(filename, "rb") as f:
+                    self._mmap = mmap.mmap(f.fileno(), 0,
+                                           access=mmap.ACCESS_READ)
+
+        except IOError as e:
+            raise FastaError(e)
+
+    def __getitem__(self, name):
+        seq_start, seq_end = self._index[name]
+        raw_seq = self._mmap[seq_start:seq_end]
+        return _STR(raw_seq.translate(None, b" \t\r\n"))
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def keys(self):
+        return self._index.keys()
+
+    def values(self):
+        return (self[name] for name in self._index)
+
+    def items(self):
+        return ((name, self[name]) for name in self._index)
+
+
 def write_fasta_dict(fasta_dict, filename):
     """
     Writes dictionary with fasta to file
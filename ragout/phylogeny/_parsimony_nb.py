@@ -0,0 +1,100 @@
+#(c) 2013-2014 by Authors
+#This file is a part of Ragout program.
+#Released under the BSD license (see LICENSE file)
+
+"""
+Jit-compiled kernel for the weighted parsimony scoring.
+The module fails to import when numba is not installed, in which case
+Phylogeny.estimate_tree falls back to the numpy implementation.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def tree_score(post_order, child_ptr, child_index, child_cost,
+               leaf_slot, leaf_state, none_state, n_states):
+    """
+    Computes the weighted parsimony score over a flattened tree.
+
+    Nodes come in post-order; children of node i occupy the
+    [child_ptr[i], child_ptr[i + 1]) slice of child_index/child_cost,
+    where child_cost holds the precomputed per-edge parsimony costs.
+    leaf_slot maps a node to its position in leaf_state (-1 for internal
+    nodes); none_state is the index of the "void" state or -1.
+    """
+    n_nodes = post_order.shape[0]
+    scores = np.empty((n_nodes, n_states), dtype=np.float64)
+
+    for i in range(n_nodes):
+        node = post_order[i]
+        slot = leaf_slot[node]
+        if slot >= 0:
+            for s in range(n_states):
+                scores[node, s] = np.inf
+            scores[node, leaf_state[slot]] = 0.0
+            continue
+
+        for s in range(n_states):
+            scores[node, s] = 0.0
+
+        for e in range(child_ptr[node], child_ptr[node + 1]):
+            child = child_index[e]
+            cost = child_cost[e]
+
+            #the cost matrix is constant off the diagonal, so tracking the
+            #best and second-best child scores gives all n_states minima
+            best1 = np.inf
+            best2 = np.inf
+            arg1 = -1
+            for cs in range(n_states):
+                val = scores[child, cs]
+                if val < best1:
+                    best2 = best1
+                    best1 = val
+                    arg1 = cs
+                elif val < best2:
+                    best2 = val
+            none_val = np.inf
+            if none_state >= 0:
+                none_val = scores[child, none_state]
+
+            for rs in range(n_states):
+                other = best2 if rs == arg1 else best1
+                val = other + cost
+                if scores[child, rs] < val:
+                    val = scores[child, rs]
+                #switching to the "void" state is free
+                if none_val < val:
+                    val = none_val
+                scores[node, rs] += val
+
+    root = post_order[n_nodes - 1]
+    best = np.inf
+    for s in range(n_states):
+        if scores[root, s] < best:
+            best = scores[root, s]
+    return best
+
+
+@njit(cache=True)
+def tree_score_batch(post_order, child_ptr, child_index, child_cost,
+                     leaf_slot, leaf_state, none_state, n_states):
+    """
+    Scores many leaf labelings in one call.
+
+    leaf_state holds one labeling per row; none_state and n_states give
+    the per-labeling "void" state index (-1 for none) and alphabet size.
+    A single call amortizes the dispatch overhead over all labelings.
+    """
+    n_cols = leaf_state.shape[0]
+    result = np.empty(n_cols, dtype=np.float64)
+    for col in range(n_cols):
+        result[col] = tree_score(post_order, child_ptr, child_index,
+                                 child_cost, leaf_slot, leaf_state[col],
+                                 none_state[col], n_states[col])
+    return result
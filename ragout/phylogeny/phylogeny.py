@@ -9,15 +9,22 @@ This module provides some phylogeny-related functions
 
 from __future__ import absolute_import
 from __future__ import division
-import math
-from collections import defaultdict
 from itertools import chain
 import logging
+import statistics
 
 import networkx as nx
+import numpy as np
 
 from ragout.parsers.phylogeny_parser import (parse_tree)
 from ragout.phylogeny.inferer import TreeInferer
+
+#optional jit-compiled scoring path
+try:
+    from ragout.phylogeny import _parsimony_nb
+except ImportError:
+    _parsimony_nb = None
+
 logger = logging.getLogger()
 
 class Phylogeny:
@@ -26,9 +33,36 @@ class Phylogeny:
     given half-breakpoint states
     """
     def __init__(self, tree):
-        self.tree = tree
+        self._tree = tree
         self.tree_string = str(tree)
         self._scale_branches()
+        self._index_tree()
+
+    @property
+    def tree(self):
+        """
+        Root node of the tree. Node objects are dropped on pickling and
+        re-parsed from the Newick string on first access
+        """
+        if self._tree is None:
+            self._tree = parse_tree(self.tree_string)
+            self._index_tree()
+        return self._tree
+
+    def __getstate__(self):
+        """
+        The flattened arrays and mu are enough for scoring, so workers
+        receive those instead of the recursive node structure and skip
+        re-parsing entirely. Memoized scores are not shipped
+        """
+        state = dict(self.__dict__)
+        state["_tree"] = None
+        state["_subtree_cache"] = {}
+        state["_tree_cache"] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
 
     @classmethod
     def from_newick(phylo, newick_str):
@@ -44,79 +78,367 @@ class Phylogeny:
         Fits mu coefficient according to branch lengths
         to avoid underflows/overflows
         """
-        def tree_length(node):
+        lengths = []
+        stack = [self.tree]
+        while stack:
+            node = stack.pop()
             if node.terminal:
-                return []
-
-            lengths = []
-            for node, _bootstrap, length in node.get_edges():
+                continue
+            for child, _bootstrap, length in node.get_edges():
                 assert length is not None
                 lengths.append(length)
-                lengths.extend(tree_length(node))
-
-            return lengths
+                stack.append(child)
 
-        lengths = tree_length(self.tree)
         assert len(lengths)
-        self.mu = float(1) / _median(lengths)
+        self.mu = float(1) / statistics.median(lengths)
         logger.debug("Branch lengths: %s, mu = %f", str(lengths), self.mu)
 
+    def _index_tree(self):
+        """
+        Enumerates tree nodes and precomputes the tuple of leaf names
+        below each node (used as memoization keys in estimate_tree).
+        Also flattens the tree into arrays for the jit-compiled scoring path.
+        """
+        self._subtree_cache = {}
+        self._tree_cache = {}
+        counter = 0
+        stack = [(self.tree, False)]
+        while stack:
+            node, children_ready = stack.pop()
+            if children_ready:
+                names = []
+                for child, _bootstrap, _length in node.get_edges():
+                    names.extend(child.leaf_names)
+                node.leaf_names = tuple(names)
+                continue
+
+            node.index = counter
+            counter += 1
+            if node.terminal:
+                node.leaf_names = (node.identifier,)
+                continue
+
+            #children in the order terminals_dfs_order visits them
+            #(non-terminals first, then by decreasing branch length),
+            #sorted once here instead of on every query
+            edges = sorted(node.get_edges(), key=lambda e: e[2], reverse=True)
+            edges.sort(key=lambda e: e[0].terminal)
+            node._sorted_children = [child for child, _bootstrap, _length
+                                     in edges]
+
+            stack.append((node, True))
+            for child, _bootstrap, _length in reversed(node.get_edges()):
+                stack.append((child, False))
+
+        #flat representation: children in CSR-like layout, nodes listed
+        #in post-order so that a simple loop visits children first
+        n_nodes = counter
+        self.leaf_names = self.tree.leaf_names
+        leaf_slots = {name : i for i, name in enumerate(self.leaf_names)}
+
+        child_lists = [[] for _ in range(n_nodes)]
+        branch_lists = [[] for _ in range(n_nodes)]
+        post_order = []
+        self._leaf_slot = np.full(n_nodes, -1, dtype=np.int32)
+        stack = [(self.tree, False)]
+        while stack:
+            node, children_ready = stack.pop()
+            if node.terminal:
+                self._leaf_slot[node.index] = leaf_slots[node.identifier]
+                post_order.append(node.index)
+                continue
+            if children_ready:
+                post_order.append(node.index)
+                continue
+
+            stack.append((node, True))
+            for child, _bootstrap, length in node.get_edges():
+                child_lists[node.index].append(child.index)
+                branch_lists[node.index].append(length)
+                stack.append((child, False))
+
+        self._post_order = np.array(post_order, dtype=np.int32)
+        self._child_ptr = np.zeros(n_nodes + 1, dtype=np.int32)
+        for i in range(n_nodes):
+            self._child_ptr[i + 1] = self._child_ptr[i] + len(child_lists[i])
+        self._child_index = np.array(list(chain(*child_lists)),
+                                     dtype=np.int32)
+        self._child_branch = np.array(list(chain(*branch_lists)),
+                                      dtype=np.float64)
+
+        #per-edge parsimony costs: mu and branch lengths never change after
+        #construction, so all the exp() work happens once here.
+        #max() prevents underflow; adding one counters possibly small
+        #exp values
+        self._child_cost = 1.0 + np.exp(-self.mu *
+                                np.maximum(self._child_branch, 0.0000001))
+        self._branch_cost = np.zeros(n_nodes)
+        for edge, child in enumerate(self._child_index):
+            self._branch_cost[child] = self._child_cost[edge]
+
     def estimate_tree(self, leaf_states):
         """
-        Scores the tree with weighted parsimony procedure
+        Scores the tree with weighted parsimony procedure.
+
+        Results are memoized: many adjacency queries induce exactly the
+        same leaf labeling, so whole calls are cached by the tuple of
+        states over the tree leaves.
         """
-        all_states = set(leaf_states.values())
+        call_key = tuple(leaf_states[name] for name in self.leaf_names)
+        score = self._tree_cache.get(call_key)
+        if score is None:
+            score = self._score_tree(leaf_states)
+            self._tree_cache[call_key] = score
+        return score
 
-        #score of a tree branch
-        def branch_score(parent, child, branch):
-            if parent == child or child is None:
-                return 0.0
+    def estimate_trees_batch(self, leaf_states_list):
+        """
+        Scores a list of leaf labelings, equivalent to (and sharing the
+        memo with) one estimate_tree call per labeling.
+
+        Labelings missing from the cache are packed into a state matrix
+        and scored in one sweep, which amortizes the per-call overhead
+        when many adjacencies are queried at once.
+        """
+        scores = [None] * len(leaf_states_list)
+        pending = []
+        miss_cols = {}
+        for i, leaf_states in enumerate(leaf_states_list):
+            call_key = tuple(leaf_states[name] for name in self.leaf_names)
+            cached = self._tree_cache.get(call_key)
+            if cached is not None:
+                scores[i] = cached
             else:
-                #prevent underflow
-                length = max(branch, 0.0000001)
-                #adding one to counter possibly small exp value 
-                return 1.0 + math.exp(-self.mu * length)
-
-        #recursive
-        def rec_helper(root):
-            if root.terminal:
-                leaf_score = (lambda s: 0.0 if s == leaf_states[root.identifier]
-                                            else float("inf"))
-                return {s : leaf_score(s) for s in all_states}
-
-            nodes_scores = {}
-            for node, _bootstrap, _length  in root.get_edges():
-                nodes_scores[node] = rec_helper(node)
-
-            root_scores = defaultdict(float)
-            for root_state in all_states:
-                for node, _bootstrap, branch_length in root.edges:
-                    min_score = float("inf")
-                    for child_state in all_states:
-                        score = (nodes_scores[node][child_state] +
-                                branch_score(root_state, child_state,
-                                             branch_length))
-                        min_score = min(min_score, score)
-                    root_scores[root_state] += min_score
-
-            return root_scores
-
-        return min(rec_helper(self.tree).values())
+                pending.append((i, call_key))
+                miss_cols.setdefault(call_key, len(miss_cols))
+        if not pending:
+            return scores
+
+        #canonical relabeling: states are numbered by first appearance
+        #in leaf order, so all columns share one padded alphabet (states
+        #unused by a column cannot change its minimum). The "void" state
+        #is special -- its index is kept per column
+        n_cols = len(miss_cols)
+        n_leaves = len(self.leaf_names)
+        leaf_state = np.zeros((n_cols, n_leaves), dtype=np.int32)
+        none_state = np.full(n_cols, -1, dtype=np.int32)
+        n_states = np.zeros(n_cols, dtype=np.int32)
+        for call_key, col in miss_cols.items():
+            state_index = {}
+            for slot, state in enumerate(call_key):
+                leaf_state[col, slot] = \
+                        state_index.setdefault(state, len(state_index))
+            if None in state_index:
+                none_state[col] = state_index[None]
+            n_states[col] = len(state_index)
+
+        if _parsimony_nb is not None:
+            col_scores = _parsimony_nb.tree_score_batch(
+                            self._post_order, self._child_ptr,
+                            self._child_index, self._child_cost,
+                            self._leaf_slot, leaf_state,
+                            none_state, n_states)
+        else:
+            col_scores = self._score_columns(leaf_state, none_state,
+                                             n_states)
+
+        for i, call_key in pending:
+            score = float(col_scores[miss_cols[call_key]])
+            self._tree_cache[call_key] = score
+            scores[i] = score
+        return scores
+
+    def _score_columns(self, leaf_state, none_state, n_states):
+        """
+        NumPy fallback for the batch scoring: the same DP as in
+        _score_tree, with per-state score vectors widened into matrices
+        that hold all columns at once
+        """
+        n_cols = leaf_state.shape[0]
+        max_states = int(n_states.max())
+        cols = np.arange(n_cols)
+        has_none = none_state >= 0
+
+        node_scores = {}
+        for index in self._post_order:
+            slot = self._leaf_slot[index]
+            if slot >= 0:
+                scores = np.full((max_states, n_cols), np.inf)
+                scores[leaf_state[:, slot], cols] = 0.0
+                node_scores[index] = scores
+                continue
+
+            scores = np.zeros((max_states, n_cols))
+            for edge in range(self._child_ptr[index],
+                              self._child_ptr[index + 1]):
+                child = self._child_index[edge]
+                cost = self._child_cost[edge]
+                child_scores = node_scores.pop(child)
+
+                best_arg = child_scores.argmin(axis=0)
+                best = child_scores[best_arg, cols]
+                best_other = np.broadcast_to(best + cost,
+                                             (max_states, n_cols)).copy()
+                if max_states > 1:
+                    second = np.partition(child_scores, 1, axis=0)[1]
+                    best_other[best_arg, cols] = second + cost
+                contrib = np.minimum(child_scores, best_other)
+                if has_none.any():
+                    void = child_scores[none_state[has_none],
+                                        cols[has_none]]
+                    contrib[:, has_none] = np.minimum(contrib[:, has_none],
+                                                      void)
+                scores += contrib
+            node_scores[index] = scores
+
+        return node_scores[self._post_order[-1]].min(axis=0)
+
+    def _score_tree(self, leaf_states):
+        """
+        Computes the weighted parsimony score of a leaf labeling.
+
+        Per-node scores are kept as numpy vectors indexed by state, so the
+        per-branch minimization is a single vectorized operation instead of
+        a nested Python loop over state pairs.
+        """
+        all_states = set(leaf_states.values())
+        states = sorted(all_states, key=repr)
+        state_index = {s : i for i, s in enumerate(states)}
+        states_key = tuple(states)
+        n_states = len(states)
+
+        if _parsimony_nb is not None:
+            leaf_state = np.array([state_index[leaf_states[name]]
+                                   for name in self.leaf_names],
+                                  dtype=np.int32)
+            none_state = state_index.get(None, -1)
+            return float(_parsimony_nb.tree_score(
+                            self._post_order, self._child_ptr,
+                            self._child_index, self._child_cost,
+                            self._leaf_slot, leaf_state,
+                            none_state, n_states))
+
+        none_index = state_index.get(None, -1)
+
+        def node_key(node):
+            #identical leaf labelings below a node yield identical scores,
+            #so results are shared across estimate_tree invocations
+            return (node.index, states_key,
+                    tuple(leaf_states[name] for name in node.leaf_names))
+
+        #iterative post-order traversal: a node is scored after its children
+        node_scores = {}
+        stack = [(self.tree, False)]
+        while stack:
+            node, children_ready = stack.pop()
+            cache_key = node_key(node)
+
+            if not children_ready:
+                cached = self._subtree_cache.get(cache_key)
+                if cached is not None:
+                    node_scores[node.index] = cached
+                    continue
+
+                if node.terminal:
+                    scores = np.full(n_states, np.inf)
+                    scores[state_index[leaf_states[node.identifier]]] = 0.0
+                    self._subtree_cache[cache_key] = scores
+                    node_scores[node.index] = scores
+                    continue
+
+                stack.append((node, True))
+                for child, _bootstrap, _length in node.get_edges():
+                    stack.append((child, False))
+                continue
+
+            scores = np.zeros(n_states)
+            for child, _bootstrap, _branch_length in node.get_edges():
+                child_scores = node_scores[child.index]
+                cost = self._branch_cost[child.index]
+
+                #the cost matrix is constant off the diagonal, so the min
+                #over child states is either the child's own-state score or
+                #the best score among the other states plus the edge cost
+                best = child_scores.min()
+                best_other = np.full(n_states, best + cost)
+                if n_states > 1:
+                    second_best = np.partition(child_scores, 1)[1]
+                    best_other[child_scores.argmin()] = second_best + cost
+                contrib = np.minimum(child_scores, best_other)
+                #switching to the "void" state is free
+                if none_index >= 0:
+                    contrib = np.minimum(contrib, child_scores[none_index])
+                scores += contrib
+
+            self._subtree_cache[cache_key] = scores
+            node_scores[node.index] = scores
+
+        return float(node_scores[self.tree.index].min())
+
+    def estimate_tree_fitch(self, leaf_states):
+        """
+        Scores the tree with unweighted (Fitch) parsimony.
+
+        Candidate state sets are packed into integer bitmasks, so each tree
+        edge costs a few native bitwise operations instead of the weighted
+        min-convolution in estimate_tree. Branch lengths are ignored and the
+        returned value is the plain number of state changes -- useful when
+        only comparative scores between labelings are needed.
+        """
+        state_bits = {}
+        for state in leaf_states.values():
+            if state not in state_bits:
+                state_bits[state] = 1 << len(state_bits)
+
+        score = 0
+        node_sets = {}
+        stack = [(self.tree, False)]
+        while stack:
+            node, children_ready = stack.pop()
+            if not children_ready:
+                if node.terminal:
+                    node_sets[node.index] = \
+                                    state_bits[leaf_states[node.identifier]]
+                    continue
+                stack.append((node, True))
+                for child, _bootstrap, _length in node.get_edges():
+                    stack.append((child, False))
+                continue
+
+            #Hartigan's majority rule -- exact also for multifurcations
+            children_sets = [node_sets[child.index]
+                             for child, _bootstrap, _length in node.get_edges()]
+            best_count = 0
+            merged = 0
+            for bit in state_bits.values():
+                count = sum(1 for child_set in children_sets
+                            if child_set & bit)
+                if count > best_count:
+                    best_count = count
+                    merged = bit
+                elif count == best_count:
+                    merged |= bit
+            score += len(children_sets) - best_count
+            node_sets[node.index] = merged
+
+        return score
 
     def terminals_dfs_order(self):
         """
         Returns terminal nodes' names in dfs order
         """
-        def get_labels(root):
-            if root.terminal:
-                return [root.identifier]
+        labels = []
+        stack = [self.tree]
+        while stack:
+            node = stack.pop()
+            if node.terminal:
+                labels.append(node.identifier)
+                continue
 
-            edges = sorted(root.get_edges(), key=lambda e: e[2], reverse=True)
-            edges = sorted(edges, key=lambda e: e[0].terminal)
-            #return list(chain(*map(lambda e: get_labels(e[0]), edges)))
-            return list(chain(*[get_labels(e[0]) for e in edges]))
+            #children are pushed in reverse so that they pop in dfs order
+            stack.extend(reversed(node._sorted_children))
 
-        return get_labels(self.tree)
+        return labels
 
     def leaves_by_distance(self, genome):
         """
@@ -124,18 +446,19 @@ class Phylogeny:
         the given genome.
         """
         graph = nx.Graph()
-        start = [None]
-        def rec_helper(root):
-            if root.terminal and root.identifier == genome:
-                start[0] = root
-            if root.terminal:
-                return
-            for node, _bootstrap, branch_length in root.edges:
-                graph.add_edge(root, node, weight=branch_length)
-                rec_helper(node)
-
-        rec_helper(self.tree)
-        distances = nx.single_source_dijkstra_path_length(graph, start[0])
+        start = None
+        stack = [self.tree]
+        while stack:
+            node = stack.pop()
+            if node.terminal:
+                if node.identifier == genome:
+                    start = node
+                continue
+            for child, _bootstrap, branch_length in node.edges:
+                graph.add_edge(node, child, weight=branch_length)
+                stack.append(child)
+
+        distances = nx.single_source_dijkstra_path_length(graph, start)
         leaves = [g for g in distances.keys()
                   if g.terminal and g.identifier != genome]
 
@@ -143,8 +466,3 @@ class Phylogeny:
         #                sorted(leaves, key=distances.get)))
         return [n.identifier for n in
                 sorted(leaves, key=distances.get)]
-
-
-def _median(values):
-    sorted_values = sorted(values)
-    return sorted_values[(len(values) - 1) // 2]
@@ -12,6 +12,7 @@ from __future__ import division
 from __future__ import print_function
 from collections import defaultdict
 from itertools import chain
+import bisect
 import os
 import logging
 from copy import deepcopy, copy
@@ -128,25 +129,33 @@ def _update_scaffolds(scaffolds, perm_container):
     perm_index = defaultdict(list)
     for perm in perm_container.target_perms:
         perm_index[(perm.chr_name, perm.repeat_id)].append(perm)
+    #buckets are sorted by start coordinate, so the permutations inside
+    #a contig are fetched with binary search instead of a linear scan
+    start_index = {}
+    for key, bucket in perm_index.items():
+        bucket.sort(key=lambda p: p.seq_start)
+        start_index[key] = [p.seq_start for p in bucket]
 
     new_scaffolds = []
     for scf in scaffolds:
         new_contigs = []
         for contig in scf.contigs:
-            inner_perms = []
-            for new_perm in perm_index[(contig.perm.chr_name,
-                                        contig.perm.repeat_id)]:
-                if (contig.perm.seq_start <= new_perm.seq_start
-                    < contig.perm.seq_end):
-                    inner_perms.append(new_perm)
-                    assert (contig.perm.seq_start < new_perm.seq_end
-                            <= contig.perm.seq_end)
+            key = (contig.perm.chr_name, contig.perm.repeat_id)
+            bucket = perm_index.get(key, [])
+            starts = start_index.get(key, [])
+            left = bisect.bisect_left(starts, contig.perm.seq_start)
+            right = bisect.bisect_left(starts, contig.perm.seq_end)
+            inner_perms = bucket[left:right]
+            for new_perm in inner_perms:
+                assert (contig.perm.seq_start < new_perm.seq_end
+                        <= contig.perm.seq_end)
 
             if not inner_perms:
                 logger.debug("Lost: %s", str(contig.perm))
                 continue
 
-            inner_perms.sort(key=lambda p: p.seq_start, reverse=contig.sign < 0)
+            if contig.sign < 0:
+                inner_perms.reverse()
             for prev_perm, next_perm in zip(inner_perms[:-1], inner_perms[1:]):
                 if contig.sign > 0:
                     gap_length = next_perm.seq_start - prev_perm.seq_end
@@ -191,7 +191,9 @@ class OutputGenerator:
         Computes and prints some useful statistics
         """
         unplaced_len = sum(map(len, list(self.unplaced_fasta.values())))
-        fragments_len = sum(map(len, list(self.fragments_fasta.values())))
+        #iterated lazily -- fragments_fasta may decode sequences on demand
+        contigs_len = [len(c) for c in self.fragments_fasta.values()]
+        fragments_len = sum(contigs_len)
         output_len = self.used_fragments_len + self.introduced_gap_len
 
         #used_perc = 100 * float(self.used_fragments_len) / fragments_len
@@ -203,7 +205,6 @@ class OutputGenerator:
         for scf in self.scaffolds:
             used_fragments_num += len(scf.contigs)
 
-        contigs_len = [len(c) for c in self.fragments_fasta.values()]
         scaffolds_len = [len(c) for c in self.scaffolds_fasta.values()]
         contigs_n50 = _calc_n50(contigs_len, fragments_len)
         scaffolds_n50 = _calc_n50(scaffolds_len, output_len)
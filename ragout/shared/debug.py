@@ -26,15 +26,14 @@ class DebugConfig():
         if not self.debugging:
             return
         self.debug_dir = debug_dir
-        if not os.path.isdir(debug_dir):
-            os.mkdir(debug_dir)
+        os.makedirs(debug_dir, exist_ok=True)
 
     def clear_debug_dir(self):
         if not self.debugging:
             return
         if os.path.isdir(self.debug_dir):
             shutil.rmtree(self.debug_dir)
-            os.mkdir(self.debug_dir)
+            os.makedirs(self.debug_dir)
 
     @staticmethod
     def get_instance():
@@ -67,7 +67,7 @@ def _make_permutations(recipe, output_dir, overwrite, threads):
                 raise BackendException("FASTA file for {0} is not "
                                        "specified".format(genome))
 
-        os.mkdir(work_dir)
+        os.makedirs(work_dir, exist_ok=True)
         config_path = _make_cactus_config(recipe, work_dir)
         hal_file = _run_cactus(config_path, work_dir, threads)
         recipe["hal"] = hal_file
@@ -84,7 +84,7 @@ class HalBackend(SyntenyBackend):
                                            "with current run")
 
         else:
-            os.mkdir(workdir)
+            os.makedirs(workdir, exist_ok=True)
 
             logger.info("Extracting FASTA from HAL")
             target_fasta = os.path.join(workdir, TARGET_FASTA)
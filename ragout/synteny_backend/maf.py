@@ -47,7 +47,7 @@ class MafBackend(SyntenyBackend):
                 files[block_size] = os.path.abspath(coords_file)
 
         else:
-            os.mkdir(workdir)
+            os.makedirs(workdir, exist_ok=True)
             logger.info("Converting MAF to synteny")
             if not m2s.make_synteny(recipe["maf"], workdir, self.blocks):
                 raise BackendException("Something went wrong with maf2synteny")
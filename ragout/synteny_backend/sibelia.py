@@ -61,14 +61,13 @@ class SibeliaBackend(SyntenyBackend):
                                "some other synteny backend for your data.",
                                total_size // 1024 // 1024)
 
-            os.mkdir(work_dir)
+            os.makedirs(work_dir, exist_ok=True)
             for block_size in self.blocks:
                 block_dir = os.path.join(work_dir, str(block_size))
                 perm_file = os.path.join(block_dir, "genomes_permutations.txt")
                 coords_file = os.path.join(block_dir, "blocks_coords.txt")
 
-                if not os.path.isdir(block_dir):
-                    os.mkdir(block_dir)
+                os.makedirs(block_dir, exist_ok=True)
 
                 all_fasta = [p["fasta"] for p in recipe["genomes"].values()]
                 _run_sibelia(all_fasta, block_size, block_dir)